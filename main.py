@@ -1,10 +1,20 @@
+import os
+import anyio
 import uvicorn
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
-from workflow_runner import WorkflowExecutor
+from fastapi.responses import JSONResponse, ORJSONResponse
+from workflow_runner import CompiledWorkflow, WorkflowExecutor, json_loads
 import json
 
-app = FastAPI()
+class WorkflowJSONResponse(ORJSONResponse):
+    """ORJSONResponse that falls back to stdlib json for content orjson can't encode (e.g. ints wider than 64 bits)."""
+    def render(self, content) -> bytes:
+        try:
+            return super().render(content)
+        except TypeError: # orjson.JSONEncodeError
+            return JSONResponse.render(self, content)
+
+app = FastAPI(default_response_class=WorkflowJSONResponse)
 
 # Embedded Workflow Data
 WORKFLOW_DATA = {
@@ -28,12 +38,19 @@ WORKFLOW_DATA = {
   "edges": []
 }
 
+# The workflow never changes at runtime, so build its static structure once
+COMPILED_WORKFLOW = CompiledWorkflow(WORKFLOW_DATA)
+
+# Set WORKFLOW_LOGS=1 to collect execution logs (returned with error responses)
+WORKFLOW_LOGS = os.environ.get("WORKFLOW_LOGS", "").lower() in ("1", "true", "yes")
+
 @app.all("/{path:path}")
 async def handle_request(request: Request):
     # Construct input data
     body = None
     try:
-        body = await request.json()
+        raw = await request.body()
+        body = json_loads(raw) if raw else None
     except:
         pass
         
@@ -46,14 +63,26 @@ async def handle_request(request: Request):
         "headers": dict(request.headers)
     }
     
-    executor = WorkflowExecutor(WORKFLOW_DATA)
-    result = executor.run(input_data)
+    executor = WorkflowExecutor(COMPILED_WORKFLOW, log_enabled=WORKFLOW_LOGS)
+    # Run the (synchronous) workflow in a worker thread so slow nodes
+    # don't block other requests on the event loop
+    result = await anyio.to_thread.run_sync(executor.run, input_data)
     
     if result.get("status") == "success":
         return result.get("response")
     else:
         # Return error details
-        return JSONResponse(status_code=500, content=result)
+        return WorkflowJSONResponse(status_code=500, content=result)
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # WEB_CONCURRENCY wins: os.cpu_count() reports host cores, not a container's CPU limit
+    workers = int(os.environ.get("WEB_CONCURRENCY") or 0) or max(2, os.cpu_count() or 1)
+    # Multiple workers need the app as an import string; each worker compiles the workflow once at import
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=workers,
+        loop="auto", # uvloop when installed (not available on Windows), asyncio otherwise
+        http="httptools",
+    )
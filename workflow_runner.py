@@ -1,9 +1,167 @@
 from typing import Dict, Any, List
 import json
+import operator
+import re
+
+import orjson
+
+# Optional accelerator for data_op over large numeric collections (requirements-accel.txt)
+try:
+    import numpy as np
+    from numba import njit
+except ImportError:
+    np = None
+    njit = None
+
+# Matches "{name}" / "{body.id}" style placeholders. Any brace-free name is accepted
+# (e.g. "{my-var}"); _lookup decides whether it resolves.
+_PLACEHOLDER_RE = re.compile(r"\{([^{}]+)\}")
+# Returned by lookups for placeholders that don't resolve to anything
+_MISSING = object()
+# Digit runs long enough to be an integer beyond 64 bits, which orjson silently turns into a float
+_LONG_DIGITS_RE = re.compile(r"\d{19,}")
+_LONG_DIGITS_BYTES_RE = re.compile(rb"\d{19,}")
+
+
+def json_loads(data):
+    """
+    orjson.loads with a stdlib json fallback for input orjson rejects or would alter:
+    NaN/Infinity literals and integers wider than 64 bits.
+    """
+    long_digits = _LONG_DIGITS_BYTES_RE if isinstance(data, (bytes, bytearray)) else _LONG_DIGITS_RE
+    if not long_digits.search(data):
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+def _str_or_json(val) -> str:
+    """Text form of a value for string interpolation. Containers are rendered as JSON."""
+    if isinstance(val, (dict, list)):
+        try:
+            return orjson.dumps(val).decode()
+        except orjson.JSONEncodeError:
+            # e.g. ints wider than 64 bits, which orjson can't encode
+            return json.dumps(val)
+    return str(val)
+
+
+def _json_fragment(val) -> str:
+    """Text form of a value spliced into a raw JSON template."""
+    if isinstance(val, bool):
+        return 'true' if val else 'false'
+    return _str_or_json(val)
+
+
+def _safe_div(a, b):
+    return a / b if b != 0 else 0
+
+
+# Collections at least this long are reduced by the compiled kernel (if numba is installed)
+_JIT_MIN_LEN = 256
+
+if njit is not None:
+    @njit(cache=True)
+    def _reduce_f64(a):
+        n = a.shape[0]
+        total = 0.0
+        low = a[0]
+        high = a[0]
+        for i in range(n):
+            v = a[i]
+            total += v
+            if v < low: low = v
+            if v > high: high = v
+        return n, total, low, high
+else:
+    _reduce_f64 = None
+
+
+def _reduce_numbers(collection: List[Any]):
+    """
+    Single pass over collection -> (count, total, low, high) of its numeric values.
+    Values that can't be converted with float() are skipped.
+    """
+    if _reduce_f64 is not None and len(collection) >= _JIT_MIN_LEN:
+        try:
+            arr = np.asarray(collection)
+        except (ValueError, OverflowError):
+            arr = None
+        # Plain bool/int/float lists only, anything else (strings, None, nested lists) takes the generic path
+        if arr is not None and arr.ndim == 1 and arr.dtype.kind in 'bif':
+            count, total, low, high = _reduce_f64(arr.astype(np.float64))
+            return count, float(total), float(low), float(high)
+
+    count = 0
+    total = 0.0
+    low = high = 0
+    for x in collection:
+        # Dispatch on the exact type so the common numeric case never raises
+        t = type(x)
+        if t is float:
+            v = x
+        elif t is int or t is bool:
+            try:
+                v = float(x)
+            except OverflowError:
+                continue
+        elif t is str:
+            try:
+                v = float(x)
+            except ValueError:
+                continue
+        else:
+            # None, dicts, lists: not numbers
+            continue
+        total += v
+        if count == 0:
+            low = high = v
+        else:
+            if v < low: low = v
+            if v > high: high = v
+        count += 1
+    return count, total, low, high
+
+
+# Math node operators
+_OPS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': _safe_div,
+    '%': operator.mod,
+}
+
+# Interface node field type -> isinstance() check (unknown types are not checked)
+_TYPE_CHECKS = {
+    'string': str,
+    'number': (int, float),
+    'boolean': bool,
+    'object': dict,
+    'array': list,
+}
+
+
+class _InvalidNode:
+    """node['_compiled'] for a node whose data couldn't be compiled. Running the node raises."""
+    __slots__ = ('message',)
+
+    def __init__(self, message: str):
+        self.message = message
+
+
+class CompiledWorkflow:
+    """
+    Static, request-independent view of a workflow.
+    Built once (e.g. at import time) and shared by every WorkflowExecutor.
+    """
+    __slots__ = ('nodes', 'edges', 'adjacency', 'node_ids', 'node_index', 'variable_node_ids', 'start_node_id')
 
-class WorkflowExecutor:
     def __init__(self, workflow_data: Dict[str, Any]):
-        self.nodes = {node['id']: node for node in workflow_data.get('nodes', [])}
+        # Shallow copies, so the compiled spec doesn't leak into the caller's workflow data
+        self.nodes = {node['id']: dict(node) for node in workflow_data.get('nodes', [])}
         self.edges = workflow_data.get('edges', [])
         # Map output node ID -> List of edge dicts {target, handle}
         self.adjacency = {}
@@ -15,47 +173,212 @@ class WorkflowExecutor:
             if source not in self.adjacency:
                 self.adjacency[source] = []
             self.adjacency[source].append({'target': target, 'handle': handle})
-            
+
+        # Small integer index per node, so traversal can track node sets in a bitset
+        self.node_ids = list(self.nodes)
+        self.node_index = {node_id: i for i, node_id in enumerate(self.node_ids)}
+
+        # Variable nodes are initialized up front (Global Scope), in declaration order
+        self.variable_node_ids = [node_id for node_id, node in self.nodes.items() if node['type'] == 'variable']
+
+        # Entry point is the first API node
+        self.start_node_id = None
+        for node_id, node in self.nodes.items():
+            if node['type'] == 'api':
+                self.start_node_id = node_id
+                break
+
+        # Pre-digest each node's static data into node['_compiled'] (read by the executor's handlers)
+        for node in self.nodes.values():
+            compiler = self._COMPILERS.get(node['type'])
+            try:
+                node['_compiled'] = compiler(self, node.get('data', {})) if compiler else None
+            except Exception as e:
+                # Malformed node data fails only the requests that reach this node, not the whole app
+                node['_compiled'] = _InvalidNode(f"Invalid {node['type']} node data: {e}")
+
+    def _compile_variable(self, data: Dict[str, Any]):
+        value = data.get('value')
+        parse_json = data.get('type', 'string') in ['json', 'array']
+        exact = None
+        template = False
+
+        if isinstance(value, str):
+            match = _PLACEHOLDER_RE.fullmatch(value)
+            if match:
+                # Single placeholder like "{myObj}", resolved at runtime to preserve type
+                exact = match.group(1)
+            elif _PLACEHOLDER_RE.search(value):
+                template = True
+            # Constant JSON values are still parsed on every run: each request must get
+            # its own object, since nodes (e.g. logic conditions) can mutate it
+
+        return {
+            'name': data.get('name'),
+            'value': value,
+            'exact': exact,
+            'template': template,
+            'parse_json': parse_json,
+        }
+
+    def _compile_logic(self, data: Dict[str, Any]):
+        # Syntax: User might use JS "===" or "!==" or simple "x > 10"
+        raw_condition = data.get('condition', 'False')
+        if not isinstance(raw_condition, str):
+            # Malformed node (becomes _InvalidNode): fails the request, it doesn't route false
+            raise TypeError(f"condition must be a string, got {type(raw_condition).__name__}")
+
+        # Simple sanitization/conversion for Python eval
+        # Replace === with ==
+        condition = raw_condition.replace('===', '==').replace('!==', '!=')
+
+        code = None
+        error = None
+        try:
+            code = compile(condition, '<logic>', 'eval')
+        except Exception as e:
+            # Invalid syntax is reported every time the node runs and routes false,
+            # like any other evaluation error
+            error = e
+
+        return {'raw': raw_condition, 'code': code, 'error': error}
+
+    def _compile_math(self, data: Dict[str, Any]):
+        op = data.get('op', '+')
+        return {
+            'valA': data.get('valA'),
+            'valB': data.get('valB'),
+            'op': op,
+            'op_fn': _OPS.get(op),
+            'result_var': data.get('resultVar', 'result'),
+        }
+
+    def _compile_data_op(self, data: Dict[str, Any]):
+        return {
+            'collection': data.get('collection', ''),
+            'op': data.get('op', 'sum'),
+            'result_var': data.get('resultVar', 'summary'),
+        }
+
+    def _compile_interface(self, data: Dict[str, Any]):
+        # (name, required, expected types, error label) per field
+        fields = []
+        for field in data.get('fields', []):
+            name = field.get('name')
+            if not name:
+                continue
+            f_type = field.get('type', 'string')
+            fields.append((name, field.get('required', False), _TYPE_CHECKS.get(f_type), f"{name} (expected {f_type})"))
+        return {'fields': fields}
+
+    def _compile_loop(self, data: Dict[str, Any]):
+        collection = data.get('collection', '')
+        # Literal "body.a.b" sources are split once here instead of on every run
+        body_path = None
+        if isinstance(collection, str) and collection.startswith('body.') and '{' not in collection:
+            body_path = collection.split('.')[1:]
+
+        return {
+            'collection': collection,
+            'body_path': body_path,
+            'item_var': data.get('variable', 'item'),
+        }
+
+    def _compile_function(self, data: Dict[str, Any]):
+        return {'name': data.get('name', 'func')}
+
+    def _compile_response(self, data: Dict[str, Any]):
+        resp_type = data.get('responseType', 'json')
+        body_def = data.get('body', '{}')
+
+        # Parse the JSON skeleton once, placeholders are substituted into the parsed tree at runtime.
+        # Bodies that only become valid JSON after substitution (e.g. "{"total": {sum}}")
+        # keep _MISSING here and fall back to text substitution.
+        template = _MISSING
+        if resp_type != 'variable':
+            try:
+                template = json_loads(body_def)
+            except Exception:
+                pass
+
+        return {'resp_type': resp_type, 'body': body_def, 'template': template}
+
+    # node type -> compiler producing node['_compiled']
+    _COMPILERS = {
+        'variable': _compile_variable,
+        'logic': _compile_logic,
+        'math': _compile_math,
+        'data_op': _compile_data_op,
+        'interface': _compile_interface,
+        'loop': _compile_loop,
+        'function': _compile_function,
+        'response': _compile_response,
+    }
+
+
+def _noop(*args):
+    pass
+
+
+class WorkflowExecutor:
+    # One executor per request: fixed attribute set, no per-instance __dict__
+    __slots__ = ('compiled', 'nodes', 'adjacency', 'context', 'execution_log',
+                 '_ctx_version', '_resolve_cache', 'loop_states', '_log')
+
+    def __init__(self, compiled: CompiledWorkflow, log_enabled: bool = False):
+        self.compiled = compiled
+        self.nodes = compiled.nodes
+        self.adjacency = compiled.adjacency
         self.context = {} # Variable storage
         self.execution_log = []
+        # Bumped on every context write, invalidates _resolve_cache
+        self._ctx_version = 0
+        # Dotted placeholder path -> (context version, resolved value)
+        self._resolve_cache = {}
+        # Loop node id -> iterator over the collection being looped
+        self.loop_states = {}
+        # Logging is off by default: messages are only formatted when it's enabled
+        self._log = self._append_log if log_enabled else _noop
+
+    def _append_log(self, msg: str, *args):
+        self.execution_log.append(msg % args if args else msg)
 
     def run(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Execute the workflow starting from the 'api' node.
         """
         # 1. Initialize all Variables first (Global Scope)
-        for node_id, node in self.nodes.items():
-            if node['type'] == 'variable':
-                self.execute_node(node)
+        for node_id in self.compiled.variable_node_ids:
+            self.execute_node(self.nodes[node_id])
                 
         # Find start node (API Node)
-        start_node = None
-        for node_id, node in self.nodes.items():
-            if node['type'] == 'api':
-                start_node = node
-                break
+        start_node_id = self.compiled.start_node_id
         
-        if not start_node:
+        if start_node_id is None:
             print("No API Entry found")
             return {"error": "No API Entry Point found"}
 
-        self.execution_log.append(f"Started execution at {start_node['data'].get('label', 'API Entry')}")
+        start_node = self.nodes[start_node_id]
+
+        self._log("Started execution at %s", start_node['data'].get('label', 'API Entry'))
         
         # Initialize context with request data flattened for easier access
         # input_data structure from invoke.py: { "method": ..., "body": {}, "query": {}, "params": {} }
-        self.context['request'] = input_data
+        self._set('request', input_data)
         
         # Expose top-level convenience variables for non-tech users
         # Users can just use {body}, {query.id}, {params.userId} etc.
         if isinstance(input_data.get('body'), dict):
-            self.context['body'] = input_data['body']
+            self._set('body', input_data['body'])
         if input_data.get('query'):
-            self.context['query'] = input_data['query']
+            self._set('query', input_data['query'])
         if input_data.get('params'):
-            self.context['params'] = input_data['params']
+            self._set('params', input_data['params'])
         
-        # Traverse
-        current_nodes = [start_node['id']]
+        # Traverse (layers hold node indices, see CompiledWorkflow.node_index)
+        node_ids = self.compiled.node_ids
+        node_index = self.compiled.node_index
+        current_nodes = [node_index[start_node_id]]
         
         visited = set()
         response = None
@@ -66,9 +389,12 @@ class WorkflowExecutor:
         while current_nodes and entry_count < 1000:
             entry_count += 1
             next_layer = []
+            # Bitset of nodes already queued, to avoid processing same node twice in same step
+            in_next = bytearray(len(node_ids))
             
             # Process current layer
-            for node_id in current_nodes:
+            for node_idx in current_nodes:
+                node_id = node_ids[node_idx]
                 # Allow re-visiting for loops, but for DAGs we might want visited check.
                 # For this simple implementation, we allow re-visit if it's a different path, 
                 # but 'visited' set prevents infinite cycles for now if we strictly track ID.
@@ -79,7 +405,7 @@ class WorkflowExecutor:
                 
                 node = self.nodes[node_id]
                 node_type = node['type']
-                self.execution_log.append(f"Executing Node: {node_type} ({node_id})")
+                self._log("Executing Node: %s (%s)", node_type, node_id)
 
                 try:
                     res = self.execute_node(node)
@@ -100,7 +426,7 @@ class WorkflowExecutor:
                         node_result = res.get('result')
 
                 except Exception as e:
-                    self.execution_log.append(f"Error executing node {node_id}: {str(e)}")
+                    self._log("Error executing node %s: %s", node_id, e)
                     return {
                         "status": "error",
                         "error": str(e),
@@ -116,22 +442,24 @@ class WorkflowExecutor:
                         
                         if node_type == 'logic':
                             # Route based on True/False
-                            if node_result is True and handle == 'true':
-                                next_layer.append(target_id)
-                            elif node_result is False and handle == 'false':
-                                next_layer.append(target_id)
+                            follow = (node_result is True and handle == 'true') or \
+                                     (node_result is False and handle == 'false')
                         elif node_type == 'loop':
                             # Route based on do/done
-                            if node_result == 'do' and handle == 'do':
-                                next_layer.append(target_id)
-                            elif node_result == 'done' and handle == 'done':
-                                next_layer.append(target_id)
+                            follow = (node_result == 'do' and handle == 'do') or \
+                                     (node_result == 'done' and handle == 'done')
                         else:
                             # Normal flow, take all connected edges
-                            next_layer.append(target_id)
+                            follow = True
+
+                        if follow:
+                            target_idx = node_index[target_id]
+                            if not in_next[target_idx]:
+                                in_next[target_idx] = 1
+                                next_layer.append(target_idx)
             
-            # De-duplicate next layer to avoid processing same node twice in same step
-            current_nodes = list(set(next_layer))
+            # next_layer is already de-duplicated and keeps discovery order
+            current_nodes = next_layer
         
         return {
             "status": "success",
@@ -140,348 +468,379 @@ class WorkflowExecutor:
             "context": self.context
         }
 
+    def _set(self, key: str, val):
+        """Write a context variable. All context writes go through here to keep _resolve_cache valid."""
+        self.context[key] = val
+        self._ctx_version += 1
+
+    def _lookup(self, path: str):
+        """Resolve a placeholder name, or a dotted path like 'body.id', against the context."""
+        context = self.context
+        if path in context:
+            return context[path]
+        if '.' not in path:
+            return _MISSING
+
+        # Dotted paths are walked once per context version
+        cached = self._resolve_cache.get(path)
+        if cached is not None and cached[0] == self._ctx_version:
+            return cached[1]
+
+        parts = path.split('.')
+        curr = context.get(parts[0], _MISSING)
+        for part in parts[1:]:
+            if isinstance(curr, dict) and part in curr:
+                curr = curr[part]
+            else:
+                curr = _MISSING
+                break
+
+        self._resolve_cache[path] = (self._ctx_version, curr)
+        return curr
+
+    def _interpolate(self, s: str, fmt=str) -> str:
+        """Replace every {placeholder} in s with fmt(value) in a single pass. Unknown placeholders are kept as-is."""
+        if '{' not in s:
+            return s
+
+        def replace(match):
+            val = self._lookup(match.group(1))
+            return match.group(0) if val is _MISSING else fmt(val)
+
+        return _PLACEHOLDER_RE.sub(replace, s)
+
     def _resolve_val(self, val):
         """Helper to substitute variables in a string or return the specific object from context if exact match."""
         if not isinstance(val, str):
             return val
         
         # Exact match (preserve type)
-        if val.startswith('{') and val.endswith('}') and val.count('{') == 1:
-            key = val[1:-1]
-            return self.context.get(key, val)
+        match = _PLACEHOLDER_RE.fullmatch(val)
+        if match:
+            resolved = self._lookup(match.group(1))
+            return val if resolved is _MISSING else resolved
         
         # Interpolation
-        if '{' in val and '}' in val:
-            for k, v in self.context.items():
-                if f"{{{k}}}" in val:
-                    val = val.replace(f"{{{k}}}", str(v))
-            return val
-        
-        return val
+        return self._interpolate(val)
 
-    def execute_node(self, node: Dict[str, Any]):
-        node_type = node['type']
-        data = node.get('data', {})
+    def _substitute_str(self, s: str):
+        """Substitute placeholders in one string leaf of a response body."""
+        if '{' not in s:
+            return s
 
-        if node_type == 'api':
-            pass
+        # Check for straightforward single variable replacement like "{myObj}"
+        # to preserve the type (e.g. if myObj is a dict, return dict, not string representation)
+        match = _PLACEHOLDER_RE.fullmatch(s)
+        if match:
+            val = self._lookup(match.group(1))
+            if val is not _MISSING:
+                return val
         
-        elif node_type == 'variable':
-            # Variable Node Execution (Init or Update)
-            var_name = data.get('name')
-            var_value = data.get('value')
-            var_type = data.get('type', 'string')
-
-            if var_name:
-                # 1. Perform Variable Substitution if value is a string
-                # This allows "Set Variable" to take values from previous nodes e.g. "{body.id}"
-                if isinstance(var_value, str):
-                    # Check for single variable replacement like "{myObj}" to preserve type
-                    if var_value.startswith('{') and var_value.endswith('}') and var_value.count('{') == 1:
-                        key = var_value[1:-1]
-                        if key in self.context:
-                            var_value = self.context[key]
-                    else:
-                        # Mixed string interpolation
-                        for key, val in self.context.items():
-                            placeholder = f"{{{key}}}"
-                            if placeholder in var_value:
-                                var_value = var_value.replace(placeholder, str(val))
-                
-                # 2. Type parsing for JSON/Array
-                if var_type in ['json', 'array'] and isinstance(var_value, str):
-                    try:
-                        var_value = json.loads(var_value)
-                    except:
-                        # If parse fails, keep as string but maybe log warning?
-                        # For now, simplistic approach.
-                        pass
-
-                self.context[var_name] = var_value
-                self.execution_log.append(f"Set Variable '{var_name}' = {str(var_value)[:50]}...")
-
-        elif node_type == 'logic':
-            # Evaluate condition
-            # Syntax: User might use JS "===" or "!==" or simple "x > 10"
-            raw_condition = data.get('condition', 'False')
-            
-            # Simple sanitization/conversion for Python eval
-            # Replace === with ==
-            condition = raw_condition.replace('===', '==').replace('!==', '!=')
-            
-            try:
-                # We pass 'self.context' as locals so variables are directly accessible by name
-                # e.g. "myVar > 10" works if myVar is in context
-                result = eval(condition, {"__builtins__": {}}, self.context)
-                self.execution_log.append(f"Logic: '{raw_condition}' -> {bool(result)}")
-                return {"type": "logic", "result": bool(result)}
-            except Exception as e:
-                self.execution_log.append(f"Logic Error: {e}")
-                return {"type": "logic", "result": False}
-
-        elif node_type == 'math':
-            # Arithmetic Logic
-            val_a = self._resolve_val(data.get('valA'))
-            val_b = self._resolve_val(data.get('valB'))
-            op = data.get('op', '+')
-            result_var = data.get('resultVar', 'result')
-            
-            # Try to convert to numbers
-            try:
-                num_a = float(val_a)
-                num_b = float(val_b)
-                
-                res = 0
-                if op == '+': res = num_a + num_b
-                elif op == '-': res = num_a - num_b
-                elif op == '*': res = num_a * num_b
-                elif op == '/': res = num_a / num_b if num_b != 0 else 0
-                elif op == '%': res = num_a % num_b
-                
-                # If both were integers (e.g. 10.0), cast back to int for cleanliness?
-                if num_a.is_integer() and num_b.is_integer():
-                     res = int(res) if res != int(res) else res # wait, simple check:
-                     if int(res) == res: res = int(res)
+        # String interpolation for mixed content "Value is {val}", rendered like the raw
+        # JSON template path (true/false, JSON containers)
+        return self._interpolate(s, _json_fragment)
 
-                self.context[result_var] = res
-                self.execution_log.append(f"Math: {num_a} {op} {num_b} = {res}")
-            except Exception:
-                # Fallback to string operations for + or failure
-                if op == '+':
-                    res = str(val_a) + str(val_b)
-                    self.context[result_var] = res
-                    self.execution_log.append(f"Math (Str): {val_a} + {val_b} = {res}")
+    def _substitute(self, root):
+        """Substitute placeholders in the object keys and string leaves of a parsed JSON value, returning a new tree."""
+        if isinstance(root, str):
+            return self._substitute_str(root)
+        if not isinstance(root, (dict, list)):
+            return root
+
+        # Iterative walk: each stack entry pairs a source container with its (pre-sized) copy
+        out = {} if isinstance(root, dict) else [None] * len(root)
+        stack = [(root, out)]
+        while stack:
+            src, dst = stack.pop()
+            is_dict = isinstance(src, dict)
+            for key, val in (src.items() if is_dict else enumerate(src)):
+                if is_dict and '{' in key:
+                    # Placeholders in object keys, e.g. {"{k}": 1}
+                    key = self._interpolate(key, _json_fragment)
+                if isinstance(val, str):
+                    dst[key] = self._substitute_str(val)
+                elif isinstance(val, dict):
+                    dst[key] = child = {}
+                    stack.append((val, child))
+                elif isinstance(val, list):
+                    dst[key] = child = [None] * len(val)
+                    stack.append((val, child))
                 else:
-                    self.execution_log.append(f"Math Error: Could not process {val_a} {op} {val_b}")
+                    dst[key] = val
+        return out
 
-        elif node_type == 'data_op':
-            # Data Aggregation Logic
-            collection_source = data.get('collection', '')
-            op = data.get('op', 'sum')
-            result_var = data.get('resultVar', 'summary')
-            
-            # 1. Resolve Collection (Same robustness as Loop)
-            collection = self._resolve_val(collection_source)
-            if isinstance(collection, str):
-                if collection in self.context:
-                    collection = self.context[collection]
-                elif collection == 'body':
-                     collection = self.context.get('body', [])
-            
-            if not isinstance(collection, list):
-                 self.execution_log.append(f"DataNode Error: Input is not a list. Value: {str(collection)[:20]}")
-                 collection = []
+    def execute_node(self, node: Dict[str, Any]):
+        if type(node['_compiled']) is _InvalidNode:
+            raise ValueError(node['_compiled'].message)
+        # 'api' nodes (and unknown types) are no-ops
+        handler = self._HANDLERS.get(node['type'])
+        return handler(self, node) if handler else None
+
+    def _exec_variable(self, node: Dict[str, Any]):
+        spec = node['_compiled']
+        # Variable Node Execution (Init or Update)
+        var_name = spec['name']
+        var_value = spec['value']
 
-            # 2. Extract Numbers
-            # Helper to get numeric values
-            nums = []
-            for x in collection:
+        if var_name:
+            # 1. Perform Variable Substitution if value is a string
+            # This allows "Set Variable" to take values from previous nodes e.g. "{body.id}"
+            if spec['exact'] is not None:
+                # Single placeholder like "{myObj}" preserves the type
+                resolved = self._lookup(spec['exact'])
+                if resolved is not _MISSING:
+                    var_value = resolved
+            elif spec['template']:
+                var_value = self._interpolate(var_value)
+            
+            # 2. Type parsing for JSON/Array
+            if spec['parse_json'] and isinstance(var_value, str):
                 try:
-                    nums.append(float(x))
+                    var_value = json_loads(var_value)
                 except:
+                    # If parse fails, keep as string but maybe log warning?
+                    # For now, simplistic approach.
                     pass
-            
-            res = 0
-            if op == 'count':
-                res = len(collection) # Count includes non-numbers
-            elif op == 'sum':
-                res = sum(nums)
-            elif op == 'avg':
-                res = sum(nums) / len(nums) if nums else 0
-            elif op == 'min':
-                res = min(nums) if nums else 0
-            elif op == 'max':
-                res = max(nums) if nums else 0
-            
-            # Clean int casting
-            if isinstance(res, float) and res.is_integer():
-                res = int(res)
 
-            self.context[result_var] = res
-            self.execution_log.append(f"Data Op: {op}(len={len(collection)}) = {res}")
+            self._set(var_name, var_value)
+            self._log("Set Variable '%s' = %.50s...", var_name, var_value)
 
-        elif node_type == 'interface':
-            # Schema Validation for Request Body
-            fields = data.get('fields', [])
-            body = self.context.get('body', {})
+    def _exec_logic(self, node: Dict[str, Any]):
+        spec = node['_compiled']
+        # Evaluate condition (compiled once by CompiledWorkflow)
+        raw_condition = spec['raw']
+        code = spec['code']
+        if code is None:
+            self._log("Logic Error: %s", spec['error'])
+            return {"type": "logic", "result": False}
+        
+        try:
+            # We pass 'self.context' as locals so variables are directly accessible by name
+            # e.g. "myVar > 10" works if myVar is in context
+            try:
+                result = eval(code, {"__builtins__": {}}, self.context)
+            finally:
+                # The condition may have changed context values without _set()
+                # (e.g. body.update(...), or a := binding), so invalidate cached lookups
+                self._ctx_version += 1
+            self._log("Logic: '%s' -> %s", raw_condition, bool(result))
+            return {"type": "logic", "result": bool(result)}
+        except Exception as e:
+            self._log("Logic Error: %s", e)
+            return {"type": "logic", "result": False}
+
+    def _exec_math(self, node: Dict[str, Any]):
+        spec = node['_compiled']
+        # Arithmetic Logic
+        val_a = self._resolve_val(spec['valA'])
+        val_b = self._resolve_val(spec['valB'])
+        op = spec['op']
+        op_fn = spec['op_fn']
+        result_var = spec['result_var']
+        
+        # Try to convert to numbers
+        try:
+            num_a = float(val_a)
+            num_b = float(val_b)
             
-            missing = []
-            invalid_types = []
+            res = op_fn(num_a, num_b) if op_fn else 0
             
-            for field in fields:
-                name = field.get('name')
-                required = field.get('required', False)
-                f_type = field.get('type', 'string')
-                
-                if not name:
-                    continue
-                
-                if required and name not in body:
-                    missing.append(name)
-                    continue
-                
+            # If both were integers (e.g. 10.0), cast back to int for cleanliness?
+            if num_a.is_integer() and num_b.is_integer():
+                 res = int(res) if res != int(res) else res # wait, simple check:
+                 if int(res) == res: res = int(res)
+
+            self._set(result_var, res)
+            self._log("Math: %s %s %s = %s", num_a, op, num_b, res)
+        except Exception:
+            # Fallback to string operations for + or failure
+            if op == '+':
+                res = str(val_a) + str(val_b)
+                self._set(result_var, res)
+                self._log("Math (Str): %s + %s = %s", val_a, val_b, res)
+            else:
+                self._log("Math Error: Could not process %s %s %s", val_a, op, val_b)
+
+    def _exec_data_op(self, node: Dict[str, Any]):
+        spec = node['_compiled']
+        # Data Aggregation Logic
+        collection_source = spec['collection']
+        op = spec['op']
+        result_var = spec['result_var']
+        
+        # 1. Resolve Collection (Same robustness as Loop)
+        collection = self._resolve_val(collection_source)
+        if isinstance(collection, str):
+            if collection in self.context:
+                collection = self.context[collection]
+            elif collection == 'body':
+                 collection = self.context.get('body', [])
+        
+        if not isinstance(collection, list):
+             self._log("DataNode Error: Input is not a list. Value: %.20s", collection)
+             collection = []
+
+        # 2. Reduce the numeric values in a single pass (no intermediate list)
+        count, total, low, high = _reduce_numbers(collection)
+        
+        res = 0
+        if op == 'count':
+            res = len(collection) # Count includes non-numbers
+        elif op == 'sum':
+            res = total
+        elif op == 'avg':
+            res = total / count if count else 0
+        elif op == 'min':
+            res = low
+        elif op == 'max':
+            res = high
+        
+        # Clean int casting
+        if isinstance(res, float) and res.is_integer():
+            res = int(res)
+
+        self._set(result_var, res)
+        self._log("Data Op: %s(len=%s) = %s", op, len(collection), res)
+
+    def _exec_interface(self, node: Dict[str, Any]):
+        spec = node['_compiled']
+        # Schema Validation for Request Body
+        fields = spec['fields']
+        body = self.context.get('body', {})
+        
+        missing = []
+        invalid_types = []
+        
+        for name, required, expected, label in fields:
+            if name in body:
                 # Type Check (Optional but good)
-                if name in body:
-                    val = body[name]
-                    if f_type == 'string' and not isinstance(val, str):
-                        invalid_types.append(f"{name} (expected string)")
-                    elif f_type == 'number' and not isinstance(val, (int, float)):
-                         # Try parsing if it's a string number? No, strict usually.
-                         # But let's be loose if it's a digit string? No, API usually strict.
-                        invalid_types.append(f"{name} (expected number)")
-                    elif f_type == 'boolean' and not isinstance(val, bool):
-                        invalid_types.append(f"{name} (expected boolean)")
-                    elif f_type == 'object' and not isinstance(val, dict):
-                         invalid_types.append(f"{name} (expected object)")
-                    elif f_type == 'array' and not isinstance(val, list):
-                         invalid_types.append(f"{name} (expected array)")
-
-            if missing or invalid_types:
-                error_msg = "Validation Error: "
-                if missing:
-                    error_msg += f"Missing fields: {', '.join(missing)}. "
-                if invalid_types:
-                    error_msg += f"Invalid types: {', '.join(invalid_types)}."
-                
-                self.execution_log.append(f"Interface Validation Failed: {error_msg}")
-                # Return immediate response which stops workflow
-                return {
-                    "type": "response", 
-                    "data": {
-                        "error": "Bad Request", 
-                        "message": error_msg.strip(),
-                        "details": {
-                            "missing": missing,
-                            "invalid": invalid_types
-                        }
+                if expected is not None and not isinstance(body[name], expected):
+                    invalid_types.append(label)
+            elif required:
+                missing.append(name)
+
+        if missing or invalid_types:
+            error_msg = "Validation Error: "
+            if missing:
+                error_msg += f"Missing fields: {', '.join(missing)}. "
+            if invalid_types:
+                error_msg += f"Invalid types: {', '.join(invalid_types)}."
+            
+            self._log("Interface Validation Failed: %s", error_msg)
+            # Return immediate response which stops workflow
+            return {
+                "type": "response", 
+                "data": {
+                    "error": "Bad Request", 
+                    "message": error_msg.strip(),
+                    "details": {
+                        "missing": missing,
+                        "invalid": invalid_types
                     }
                 }
-            
-            self.execution_log.append(f"Interface Validation Passed")
+            }
+        
+        self._log("Interface Validation Passed")
 
-        elif node_type == 'loop':
-            collection_source = data.get('collection', '')
-            item_var = data.get('variable', 'item')
-            
-            # 1. First Pass: Resolve {variables} or keep string
-            collection = self._resolve_val(collection_source)
-            
-            # 2. Second Pass: If string, try path lookup (body.items or direct key)
-            if isinstance(collection, str):
-                if collection.startswith('body.'):
-                     path_parts = collection.split('.')
-                     curr = self.context.get('body', {})
-                     for part in path_parts[1:]:
-                         if isinstance(curr, dict):
-                             curr = curr.get(part)
-                         else:
-                             curr = []
-                             break
-                     collection = curr
-                elif collection == 'body':
-                     collection = self.context.get('body', [])
-                elif collection in self.context:
-                     collection = self.context[collection]
+    def _walk_body(self, path_parts: List[str]):
+        """Follow path_parts (e.g. ['items']) into the request body. Non-dict steps yield an empty list."""
+        curr = self.context.get('body', {})
+        for part in path_parts:
+            if isinstance(curr, dict):
+                curr = curr.get(part)
+            else:
+                return []
+        return curr
+
+    def _exec_loop(self, node: Dict[str, Any]):
+        spec = node['_compiled']
+        node_id = node['id']
+        item_var = spec['item_var']
+
+        # Per-run state: an enumerate() iterator over the collection, created on the first visit
+        it = self.loop_states.get(node_id)
+        if it is None:
+            collection_source = spec['collection']
             
+            if spec['body_path'] is not None:
+                # Path pre-split by CompiledWorkflow
+                collection = self._walk_body(spec['body_path'])
+            else:
+                # 1. First Pass: Resolve {variables} or keep string
+                collection = self._resolve_val(collection_source)
+        
+                # 2. Second Pass: If string, try path lookup (body.items or direct key)
+                if isinstance(collection, str):
+                    if collection.startswith('body.'):
+                         collection = self._walk_body(collection.split('.')[1:])
+                    elif collection == 'body':
+                         collection = self.context.get('body', [])
+                    elif collection in self.context:
+                         collection = self.context[collection]
+        
             # 3. Validation
             if not isinstance(collection, list):
-                 self.execution_log.append(f"Loop Error: Collection '{collection_source}' resolved to {type(collection)}, expected list. Defaulting to empty.")
+                 self._log("Loop Error: Collection '%s' resolved to %s, expected list. Defaulting to empty.", collection_source, type(collection))
                  collection = []
 
-            # Get State
-            loop_states = self.context.setdefault('_loop_states', {})
-            state = loop_states.get(node.get('id'), {'index': 0})
-            
-            idx = state['index']
-            
-            if idx < len(collection):
-                # Do
-                item = collection[idx]
-                if item_var:
-                    self.context[item_var] = item
-                self.execution_log.append(f"Loop {node.get('id')}: Item {idx} = {str(item)[:20]}")
-                
-                # Increment
-                state['index'] = idx + 1
-                loop_states[node.get('id')] = state
-                return {"type": "loop", "result": "do"}
-            else:
-                # Done
-                self.execution_log.append(f"Loop {node.get('id')}: Done")
-                # Reset for next run
-                state['index'] = 0 
-                loop_states[node.get('id')] = state
-                return {"type": "loop", "result": "done"}
-
-        elif node_type == 'function':
-            func_name = data.get('name', 'func')
-            self.execution_log.append(f"Ran function {func_name}")
-            # Mock
+            it = enumerate(collection)
+            self.loop_states[node_id] = it
         
-        elif node_type == 'response':
-            resp_type = data.get('responseType', 'json')
-            body_def = data.get('body', '{}')
-            
-            if resp_type == 'variable':
-                var_name = body_def
-                val = self.context.get(var_name)
-                if not val and isinstance(var_name, str) and var_name.startswith('{') and var_name.endswith('}'):
-                     stripped = var_name.strip('{}')
-                     val = self.context.get(stripped)
-                return {"type": "response", "data": val}
-            else:
-                try:
-                    # Recursive substitution function for nested dicts/lists
-                    def substitute(obj):
-                        if isinstance(obj, str):
-                            # Check for straightforward single variable replacement like "{myObj}"
-                            # to preserve the type (e.g. if myObj is a dict, return dict, not string representation)
-                            if obj.startswith('{') and obj.endswith('}') and obj.count('{') == 1:
-                                key = obj[1:-1]
-                                if key in self.context:
-                                    return self.context[key]
-                            
-                            # String interpolation for mixed content "Value is {val}"
-                            for key, val in self.context.items():
-                                placeholder = f"{{{key}}}"
-                                if placeholder in obj:
-                                     # Basic string replace
-                                     if isinstance(val, (dict, list)):
-                                         obj = obj.replace(placeholder, json.dumps(val))
-                                     else:
-                                         obj = obj.replace(placeholder, str(val))
-                            return obj
-                        elif isinstance(obj, dict):
-                            return {k: substitute(v) for k, v in obj.items()}
-                        elif isinstance(obj, list):
-                            return [substitute(i) for i in obj]
-                        return obj
-
-                    # First try to parse the JSON skeleton
-                    # Then substitute values inside
-                    # OR substitute string first then parse? 
-                    # Substituting string first is risky for quotes.
-                    # BUt user inputs string.
-                    
-                    # Let's try naïve string sub first as before, but improved.
-                    final_body = body_def
-                    for key, val in self.context.items():
-                        placeholder = f"{{{key}}}"
-                        if placeholder in final_body:
-                             if isinstance(val, (int, float, bool)):
-                                 final_body = final_body.replace(placeholder, str(val).lower() if isinstance(val, bool) else str(val))
-                             elif isinstance(val, (dict, list)):
-                                 final_body = final_body.replace(placeholder, json.dumps(val))
-                             else:
-                                 # It's a string value. If we just insert it, we might break JSON if it has quotes.
-                                 # e.g. "name": "{name}" -> "name": "tushar" (ok)
-                                 # "name": "{name}" where name='a"b' -> "name": "a"b" (INVALID JSON)
-                                 # Correct way is difficult with pure string replace on raw JSON.
-                                 final_body = final_body.replace(placeholder, str(val))
-                    
-                    return {"type": "response", "data": json.loads(final_body)}
-                except Exception as e:
-                    self.execution_log.append(f"Error parsing response body: {e}")
-                    return {"type": "response", "data": {"raw": body_def, "error": "JSON parse error"}}
+        entry = next(it, _MISSING)
+        if entry is _MISSING:
+            # Done
+            self._log("Loop %s: Done", node_id)
+            # Reset for next run
+            del self.loop_states[node_id]
+            return {"type": "loop", "result": "done"}
+
+        # Do
+        idx, item = entry
+        if item_var:
+            self._set(item_var, item)
+        self._log("Loop %s: Item %s = %.20s", node_id, idx, item)
+        return {"type": "loop", "result": "do"}
+
+    def _exec_function(self, node: Dict[str, Any]):
+        func_name = node['_compiled']['name']
+        self._log("Ran function %s", func_name)
+        # Mock
+
+    def _exec_response(self, node: Dict[str, Any]):
+        spec = node['_compiled']
+        resp_type = spec['resp_type']
+        body_def = spec['body']
         
-        return None
+        if resp_type == 'variable':
+            var_name = body_def
+            val = self.context.get(var_name)
+            if not val and isinstance(var_name, str) and var_name.startswith('{') and var_name.endswith('}'):
+                 stripped = var_name.strip('{}')
+                 val = self.context.get(stripped)
+            return {"type": "response", "data": val}
+        else:
+            template = spec['template']
+            if template is not _MISSING:
+                return {"type": "response", "data": self._substitute(template)}
+
+            try:
+                # Values are rendered as JSON fragments (true/false, numbers, objects).
+                # Note: string values containing quotes can still break the JSON here.
+                final_body = self._interpolate(body_def, _json_fragment)
+                
+                return {"type": "response", "data": json_loads(final_body)}
+            except Exception as e:
+                self._log("Error parsing response body: %s", e)
+                return {"type": "response", "data": {"raw": body_def, "error": "JSON parse error"}}
+
+    # node type -> handler, looked up once per node visit
+    _HANDLERS = {
+        'variable': _exec_variable,
+        'logic': _exec_logic,
+        'math': _exec_math,
+        'data_op': _exec_data_op,
+        'interface': _exec_interface,
+        'loop': _exec_loop,
+        'function': _exec_function,
+        'response': _exec_response,
+    }